@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
 import re
 from asyncio import Semaphore
 from datetime import datetime, timedelta
 from enum import Enum
 from fnmatch import fnmatch
-from sys import argv
+from sys import argv, stdout
 from typing import TYPE_CHECKING, Literal
 from urllib.parse import quote_from_bytes
 
@@ -18,6 +19,8 @@ from pydantic import BaseModel, conint, validator
 if TYPE_CHECKING:
     from httpx import Response
 
+logger = logging.getLogger(__name__)
+
 BASE_URL = 'https://api.github.com'
 
 
@@ -76,14 +79,14 @@ async def wait_for_rate_limit(*, response: Response, eligible_for_secondary_limi
         delta = ratelimit_reset - datetime.now()
 
         if delta > timedelta(seconds=MAX_SLEEP):
-            print(
+            logger.error(
                 f'Rate limited for {delta} seconds. '
                 f'Terminating workflow, since that\'s above the maximum allowed sleep time. '
                 f'Retry the job manually, when the rate limit is refreshed.'
             )
             exit(1)
         elif delta > timedelta(seconds=0):
-            print(f'Rate limit exceeded. Sleeping for {delta} seconds')
+            logger.warning(f'Rate limit exceeded. Sleeping for {delta} seconds')
             await asyncio.sleep(delta.total_seconds())
 
     elif eligible_for_secondary_limit:
@@ -184,13 +187,13 @@ def post_deletion_output(*, response: Response, image_name: str, version_id: int
             needs_github_assistance.append(image_name_with_tag)
         else:
             failed.append(image_name_with_tag)
-            print(
+            logger.error(
                 f'\nCouldn\'t delete {image_name_with_tag}.\n'
                 f'Status code: {response.status_code}\nResponse: {response.json()}\n'
             )
     else:
         deleted.append(image_name_with_tag)
-        print(f'Deleted old image: {image_name_with_tag}')
+        logger.info(f'Deleted old image: {image_name_with_tag}')
 
 
 async def delete_package_version(
@@ -202,7 +205,7 @@ async def delete_package_version(
             await wait_for_rate_limit(response=response, eligible_for_secondary_limit=True)
             post_deletion_output(response=response, image_name=image_name, version_id=version_id)
         except TimeoutException as e:
-            print(f'Request to delete {image_name} timed out with error `{e}`')
+            logger.error(f'Request to delete {image_name} timed out with error `{e}`')
 
 
 async def delete_org_package_versions(
@@ -344,7 +347,7 @@ async def get_and_delete_old_versions(image_name: str, inputs: Inputs, http_clie
             updated_or_created_at = getattr(version, inputs.timestamp_to_use.value)
 
             if not updated_or_created_at:
-                print(f'Skipping image version {version.id}. Unable to parse timestamps.')
+                logger.info(f'Skipping image version {version.id}. Unable to parse timestamps.')
                 continue
 
             if inputs.cut_off < updated_or_created_at:
@@ -406,7 +409,7 @@ async def get_and_delete_old_versions(image_name: str, inputs: Inputs, http_clie
             tasks.remove(tasks[0])
 
     if not tasks:
-        print(f'No more versions to delete for {image_name}')
+        logger.info(f'No more versions to delete for {image_name}')
 
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -416,7 +419,7 @@ async def get_and_delete_old_versions(image_name: str, inputs: Inputs, http_clie
                 raise item
             except Exception as e:
                 # Unhandled errors *shouldn't* occur
-                print(
+                logger.error(
                     f'Unhandled exception raised at runtime: `{e}`. '
                     f'Please report this at https://github.com/snok/container-retention-policy/issues/new'
                 )
@@ -546,4 +549,5 @@ async def main(
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=stdout)
     asyncio.run(main(*argv[1:]))
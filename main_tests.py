@@ -1,12 +1,14 @@
 import asyncio
+import logging
 import os
 import tempfile
 from asyncio import Semaphore
-from copy import deepcopy
 from datetime import datetime, timedelta, timezone
+from functools import cache
+from types import MappingProxyType, SimpleNamespace
 from unittest.mock import AsyncMock, Mock
 
-import pytest as pytest
+import pytest
 from httpx import AsyncClient
 from pydantic import ValidationError
 
@@ -29,29 +31,110 @@ from main import main as main_
 from main import post_deletion_output, wait_for_rate_limit
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
+def event_loop():
+    """
+    Run all async tests in the same event loop, instead of creating a new loop per test.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+def _create_ok_response():
+    return SimpleNamespace(
+        headers={'x-ratelimit-remaining': '1', 'link': ''},
+        is_error=False,
+        status_code=200,
+        json=lambda: [],
+        raise_for_status=lambda: None,
+    )
+
+
+@pytest.fixture(scope='session')
 def ok_response():
-    mock_ok_response = Mock()
-    mock_ok_response.headers = {'x-ratelimit-remaining': '1', 'link': ''}
-    mock_ok_response.json.return_value = []
-    mock_ok_response.is_error = False
-    yield mock_ok_response
+    """
+    Shared across the test session - tests that need to modify a response should create their own.
+    """
+    yield _create_ok_response()
 
 
-@pytest.fixture
+@pytest.fixture(scope='session')
 def bad_response():
-    mock_bad_response = Mock()
-    mock_bad_response.headers = {'x-ratelimit-remaining': '1', 'link': ''}
-    mock_bad_response.is_error = True
-    yield mock_bad_response
+    yield SimpleNamespace(
+        headers={'x-ratelimit-remaining': '1', 'link': ''},
+        is_error=True,
+        status_code=500,
+        json=lambda: {'message': 'Server Error'},
+    )
 
 
-@pytest.fixture
+class StaticResponseClient:
+    """
+    Stand-in for the httpx client, which responds to every request with the same response.
+    """
+
+    def __init__(self, response):
+        self.response = response
+
+    async def get(self, *args, **kwargs):
+        return self.response
+
+    async def delete(self, *args, **kwargs):
+        return self.response
+
+
+@pytest.fixture(scope='session')
 def http_client(ok_response):
-    mock_http_client = AsyncMock()
-    mock_http_client.get.return_value = ok_response
-    mock_http_client.delete.return_value = ok_response
-    yield mock_http_client
+    yield StaticResponseClient(ok_response)
+
+
+@pytest.fixture
+def sem():
+    yield Semaphore(1)
+
+
+@pytest.fixture
+def blocked_sem():
+    yield Semaphore(0)
+
+
+@pytest.fixture
+def virtual_clock(monkeypatch, event_loop):
+    """
+    Only let time pass in the event loop when it would otherwise sit idle.
+
+    Instead of blocking until the next scheduled callback is due, the loop's clock jumps
+    straight to it, so sleeps and timeouts run out without any real time passing.
+    """
+    now = 0.0
+    select = event_loop._selector.select
+
+    def _select(timeout=None):
+        nonlocal now
+        events = select(0)
+        if not events and timeout:
+            now += timeout
+        return events
+
+    monkeypatch.setattr(event_loop, 'time', lambda: now)
+    monkeypatch.setattr(event_loop._selector, 'select', _select)
+    yield
+
+
+@pytest.fixture
+def patch_list_package_versions(mocker):
+    """
+    Make GithubAPI.list_package_versions return the given package versions.
+    """
+
+    def _patch(data):
+        # An already resolved future can be awaited any number of times, without creating a coroutine per call
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(data)
+        mocker.patch.object(main.GithubAPI, 'list_package_versions', lambda **kwargs: future)
+
+    yield _patch
 
 
 @pytest.fixture(autouse=True)
@@ -68,17 +151,21 @@ async def test_list_org_package_version(http_client):
     await list_org_package_versions(org_name='test', image_name='test', http_client=http_client)
 
 
-async def test_wait_for_rate_limit(ok_response, capsys):
+@pytest.mark.slow
+async def test_wait_for_rate_limit(caplog):
+    caplog.set_level(logging.INFO, logger='main')
+    ok_response = _create_ok_response()
+
     # No rate limit hit, no secondary limit
     start = datetime.now()
     await wait_for_rate_limit(response=ok_response, eligible_for_secondary_limit=False)
-    assert capsys.readouterr().out == ''  # no output
+    assert caplog.messages == []  # no output
     assert (datetime.now() - start).seconds == 0
 
     # No rate limit hit, with secondary limit - this should sleep for one second
     start = datetime.now()
     await wait_for_rate_limit(response=ok_response, eligible_for_secondary_limit=True)
-    assert capsys.readouterr().out == ''  # no output
+    assert caplog.messages == []  # no output
     assert (datetime.now() - start).seconds == 1  # ~1 second runtime
 
     # Run with timeout exceeding max limit - this should exit the program
@@ -86,84 +173,103 @@ async def test_wait_for_rate_limit(ok_response, capsys):
     ok_response.headers |= {'x-ratelimit-reset': (datetime.now() + timedelta(seconds=MAX_SLEEP + 1)).timestamp()}
     with pytest.raises(SystemExit):
         await wait_for_rate_limit(response=ok_response)
-    assert " Terminating workflow, since that's above the maximum allowed sleep time" in capsys.readouterr().out
+    assert " Terminating workflow, since that's above the maximum allowed sleep time" in caplog.messages[-1]
 
     # Run with timeout below max limit - this should just sleep for a bit
     ok_response.headers |= {'x-ratelimit-reset': (datetime.now() + timedelta(seconds=2)).timestamp()}
     await wait_for_rate_limit(response=ok_response)
-    assert 'Rate limit exceeded. Sleeping for' in capsys.readouterr().out
+    assert 'Rate limit exceeded. Sleeping for' in caplog.messages[-1]
 
 
 async def test_list_package_version(http_client):
     await list_package_versions(image_name='test', http_client=http_client)
 
 
-async def test_delete_org_package_version(http_client):
+async def test_delete_org_package_version(http_client, sem):
     await delete_org_package_versions(
         org_name='test',
         image_name='test',
         http_client=http_client,
         version_id=123,
-        semaphore=Semaphore(1),
+        semaphore=sem,
     )
 
 
-async def test_delete_package_version(http_client):
-    await delete_package_versions(image_name='test', http_client=http_client, version_id=123, semaphore=Semaphore(1))
+async def test_delete_package_version(http_client, sem):
+    await delete_package_versions(image_name='test', http_client=http_client, version_id=123, semaphore=sem)
 
 
-async def test_delete_package_version_semaphore(http_client):
+async def test_delete_package_version_semaphore(virtual_clock, http_client, sem, blocked_sem):
     """
     A bit of a useless test, but proves Semaphores work the way we think.
     """
-    # Test that we're still waiting after 1 second, when the semaphore is empty
-    sem = Semaphore(0)
-    with pytest.raises(asyncio.TimeoutError):
-        await asyncio.wait_for(
-            delete_package_versions(image_name='test', http_client=http_client, version_id=123, semaphore=sem),
-            2,
-        )
-
-    # Assert that this would not be the case otherwise
-    sem = Semaphore(1)
-    await asyncio.wait_for(
-        delete_package_versions(image_name='test', http_client=http_client, version_id=123, semaphore=sem),
-        2,
-    )
+    # Test that we're still waiting after 10 seconds, when the semaphore is empty
+    with pytest.raises(TimeoutError):
+        async with asyncio.timeout(10):
+            await delete_package_versions(
+                image_name='test', http_client=http_client, version_id=123, semaphore=blocked_sem
+            )
+
+    # Assert that this would not be the case otherwise. The deletion itself sleeps
+    # for a second, to respect secondary rate limits, which is well within the timeout
+    async with asyncio.timeout(10):
+        await delete_package_versions(image_name='test', http_client=http_client, version_id=123, semaphore=sem)
 
 
-def test_post_deletion_output(capsys, ok_response, bad_response):
+def test_post_deletion_output(mocker, caplog, ok_response, bad_response):
+    caplog.set_level(logging.INFO, logger='main')
+
     # Happy path
     post_deletion_output(response=ok_response, image_name='test', version_id=123)
-    captured = capsys.readouterr()
-    assert captured.out == 'Deleted old image: test:123\n'
+    assert caplog.messages == ['Deleted old image: test:123']
+    caplog.clear()
 
     # Bad response
     post_deletion_output(response=bad_response, image_name='test', version_id=123)
-    captured = capsys.readouterr()
-    assert captured.out != 'Deleted old image: test:123\n'
+    assert caplog.messages != ['Deleted old image: test:123']
+    assert caplog.records[-1].levelno == logging.ERROR
+    caplog.clear()
+
+    # Public image with more than 5000 downloads - this is reported at the end of the run instead
+    mocker.patch.object(main, 'needs_github_assistance', [])
+    response = SimpleNamespace(is_error=True, status_code=400, json=lambda: {'message': main.GITHUB_ASSISTANCE_MSG})
+    post_deletion_output(response=response, image_name='test', version_id=123)
+    assert caplog.messages == []
+    assert main.needs_github_assistance == ['test:123']
+
+
+input_defaults = MappingProxyType(
+    {
+        'image_names': 'a,b',
+        'cut_off': 'an hour ago utc',
+        'timestamp_to_use': 'created_at',
+        'untagged_only': 'false',
+        'skip_tags': '',
+        'keep_at_least': '0',
+        'filter_tags': '',
+        'filter_include_untagged': 'true',
+        'token': 'test',
+        'account_type': 'personal',
+    }
+)
 
 
-input_defaults = {
-    'image_names': 'a,b',
-    'cut_off': 'an hour ago utc',
-    'timestamp_to_use': 'created_at',
-    'untagged_only': 'false',
-    'skip_tags': '',
-    'keep_at_least': '0',
-    'filter_tags': '',
-    'filter_include_untagged': 'true',
-    'token': 'test',
-    'account_type': 'personal',
-}
+@cache
+def _cached_inputs_model(frozen_kwargs):
+    """
+    Validating inputs is slow (the cut-off is parsed by dateparser), so only do it once per set of inputs.
+    """
+    return Inputs(**(input_defaults | dict(frozen_kwargs)))
 
 
 def _create_inputs_model(**kwargs):
     """
     Little helper method, to help us instantiate working Inputs models.
+
+    Models are shared between calls with the same arguments, so they shouldn't be mutated.
     """
 
-    return Inputs(**(input_defaults | kwargs))
+    return _cached_inputs_model(tuple(sorted(kwargs.items())))
 
 
 def test_org_name_empty():
@@ -171,7 +277,7 @@ def test_org_name_empty():
         Inputs(**(input_defaults | {'account_type': 'org', 'org_name': ''}))
 
 
-async def test_inputs_model_personal(mocker):
+async def test_inputs_model_personal(mocker, http_client, sem):
     # Mock the personal list function
     mocked_list_package_versions: AsyncMock = mocker.patch.object(main, 'list_package_versions', AsyncMock())
     mocked_delete_package_versions: AsyncMock = mocker.patch.object(main, 'delete_package_versions', AsyncMock())
@@ -185,15 +291,15 @@ async def test_inputs_model_personal(mocker):
         account_type=personal.account_type,
         org_name=personal.org_name,
         image_name=personal.image_names[0],
-        http_client=AsyncMock(),
+        http_client=http_client,
     )
     await main.GithubAPI.delete_package(
         account_type=personal.account_type,
         org_name=personal.org_name,
         image_name=personal.image_names[0],
-        http_client=AsyncMock(),
+        http_client=http_client,
         version_id=1,
-        semaphore=Semaphore(1),
+        semaphore=sem,
     )
 
     # Make sure the right function was called
@@ -201,7 +307,7 @@ async def test_inputs_model_personal(mocker):
     mocked_delete_package_versions.assert_awaited_once()
 
 
-async def test_inputs_model_org(mocker):
+async def test_inputs_model_org(mocker, http_client, sem):
     # Mock the org list function
     mocked_list_package_versions: AsyncMock = mocker.patch.object(main, 'list_org_package_versions', AsyncMock())
     mocked_delete_package_versions: AsyncMock = mocker.patch.object(main, 'delete_org_package_versions', AsyncMock())
@@ -212,15 +318,15 @@ async def test_inputs_model_org(mocker):
 
     # Call the GithubAPI utility function
     await main.GithubAPI.list_package_versions(
-        account_type=org.account_type, org_name=org.org_name, image_name=org.image_names[0], http_client=AsyncMock()
+        account_type=org.account_type, org_name=org.org_name, image_name=org.image_names[0], http_client=http_client
     )
     await main.GithubAPI.delete_package(
         account_type=org.account_type,
         org_name=org.org_name,
         image_name=org.image_names[0],
-        http_client=AsyncMock(),
+        http_client=http_client,
         version_id=1,
-        semaphore=Semaphore(1),
+        semaphore=sem,
     )
 
     # Make sure the right function was called
@@ -228,43 +334,40 @@ async def test_inputs_model_org(mocker):
     mocked_delete_package_versions.assert_awaited_once()
 
 
-class TestGetAndDeleteOldVersions:
-    valid_data = [
-        PackageVersionResponse(
-            **{
-                'id': 1234567,
-                'name': 'sha256:3c6891187412bd31fa04c63b4f06c47417eb599b1b659462632285531aa99c19',
-                'created_at': '2021-05-26T14:03:03Z',
-                'updated_at': '2021-05-26T14:03:03Z',
-                'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-                'html_url': 'https://github.com/orgs/org-name/packages/container/image-name/1234567',
-                'package_html_url': 'https://github.com/orgs/org-name/packages/container/package/image-name',
-                'url': 'https://api.github.com/orgs/org-name/packages/container/image-name/versions/1234567',
-            }
-        )
-    ]
-
-    async def test_delete_package(self, mocker, capsys, http_client):
-        # Mock the list function
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=self.valid_data)
-
-        # Call the function
-        inputs = _create_inputs_model()
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-
-        # Check the output
-        captured = capsys.readouterr()
-        assert captured.out == 'Deleted old image: a:1234567\n'
-
-    async def test_keep_at_least(self, mocker, capsys, http_client):
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=self.valid_data)
-        inputs = _create_inputs_model(keep_at_least=1)
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_not_beyond_cutoff(self, mocker, capsys, http_client):
-        response_data = [
+# Read-only, since the same instances are shared between test cases
+_VALID_VERSION = MappingProxyType(
+    {
+        'id': 1234567,
+        'name': 'sha256:3c6891187412bd31fa04c63b4f06c47417eb599b1b659462632285531aa99c19',
+        'created_at': '2021-05-26T14:03:03Z',
+        'updated_at': '2021-05-26T14:03:03Z',
+        'metadata': {'container': {'tags': []}, 'package_type': 'container'},
+        'html_url': 'https://github.com/orgs/org-name/packages/container/image-name/1234567',
+        'package_html_url': 'https://github.com/orgs/org-name/packages/container/package/image-name',
+        'url': 'https://api.github.com/orgs/org-name/packages/container/image-name/versions/1234567',
+    }
+)
+_VALID_DATA = (PackageVersionResponse(**_VALID_VERSION),)
+
+
+def _valid_data_with_tags(tags):
+    """
+    Copy of the valid data, with the image version tagged with the given tags.
+    """
+    metadata = MetadataModel(**{'container': {'tags': tags}, 'package_type': 'container'})
+    return (_VALID_DATA[0].copy(update={'metadata': metadata}),)
+
+
+_DELETED_A = 'Deleted old image: a:1234567'
+_NO_MORE_A = 'No more versions to delete for a'
+_SKIPPED_MISSING_TIMESTAMP = 'Skipping image version 1234567. Unable to parse timestamps.'
+
+# The package versions returned by the list function, the inputs to use, and the expected log messages
+get_and_delete_old_versions_cases = (
+    (_VALID_DATA, {}, [_DELETED_A]),
+    (_VALID_DATA, {'keep_at_least': 1}, [_NO_MORE_A]),
+    (
+        [
             PackageVersionResponse(
                 created_at=datetime.now(timezone(timedelta(hours=1))),
                 updated_at=datetime.now(timezone(timedelta(hours=1))),
@@ -272,15 +375,12 @@ class TestGetAndDeleteOldVersions:
                 name='',
                 metadata={'container': {'tags': []}, 'package_type': 'container'},
             )
-        ]
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=response_data)
-        inputs = _create_inputs_model()
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_missing_timestamp(self, mocker, capsys, http_client):
-        data = [
+        ],
+        {},
+        [_NO_MORE_A],
+    ),
+    (
+        [
             PackageVersionResponse(
                 created_at=None,
                 updated_at=None,
@@ -288,61 +388,45 @@ class TestGetAndDeleteOldVersions:
                 name='',
                 metadata={'container': {'tags': []}, 'package_type': 'container'},
             )
-        ]
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model()
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert (
-            captured.out
-            == 'Skipping image version 1234567. Unable to parse timestamps.\nNo more versions to delete for a\n'
-        )
-
-    async def test_empty_list(self, mocker, capsys, http_client):
-        data = []
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model()
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_skip_tags(self, mocker, capsys, http_client):
-        data = deepcopy(self.valid_data)
-        data[0].metadata = MetadataModel(**{'container': {'tags': ['abc', 'bcd']}, 'package_type': 'container'})
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model(skip_tags='abc')
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_skip_tags_wildcard(self, mocker, capsys, http_client):
-        data = deepcopy(self.valid_data)
-        data[0].metadata = MetadataModel(**{'container': {'tags': ['v1.0.0', 'abc']}, 'package_type': 'container'})
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model(skip_tags='v*')
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_untagged_only(self, mocker, capsys, http_client):
-        data = deepcopy(self.valid_data)
-        data[0].metadata = MetadataModel(**{'container': {'tags': ['abc', 'bcd']}, 'package_type': 'container'})
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model(untagged_only='true')
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'No more versions to delete for a\n'
-
-    async def test_filter_tags(self, mocker, capsys, http_client):
-        data = deepcopy(self.valid_data)
-        data[0].metadata = MetadataModel(
-            **{'container': {'tags': ['sha-deadbeef', 'edge']}, 'package_type': 'container'}
-        )
-        mocker.patch.object(main.GithubAPI, 'list_package_versions', return_value=data)
-        inputs = _create_inputs_model(filter_tags='sha-*')
-        await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
-        captured = capsys.readouterr()
-        assert captured.out == 'Deleted old image: a:1234567\n'
+        ],
+        {},
+        [_SKIPPED_MISSING_TIMESTAMP, _NO_MORE_A],
+    ),
+    ([], {}, [_NO_MORE_A]),
+    (_valid_data_with_tags(['abc', 'bcd']), {'skip_tags': 'abc'}, [_NO_MORE_A]),
+    (_valid_data_with_tags(['v1.0.0', 'abc']), {'skip_tags': 'v*'}, [_NO_MORE_A]),
+    (_valid_data_with_tags(['abc', 'bcd']), {'untagged_only': 'true'}, [_NO_MORE_A]),
+    (_valid_data_with_tags(['sha-deadbeef', 'edge']), {'filter_tags': 'sha-*'}, [_DELETED_A]),
+)
+
+
+@pytest.mark.parametrize(
+    'data,kwargs,expected',
+    get_and_delete_old_versions_cases,
+    ids=[
+        'delete_package',
+        'keep_at_least',
+        'not_beyond_cutoff',
+        'missing_timestamp',
+        'empty_list',
+        'skip_tags',
+        'skip_tags_wildcard',
+        'untagged_only',
+        'filter_tags',
+    ],
+)
+async def test_get_and_delete_old_versions(patch_list_package_versions, caplog, http_client, data, kwargs, expected):
+    caplog.set_level(logging.INFO, logger='main')
+
+    # Mock the list function
+    patch_list_package_versions(data)
+
+    # Call the function
+    inputs = _create_inputs_model(**kwargs)
+    await get_and_delete_old_versions(image_name='a', inputs=inputs, http_client=http_client)
+
+    # Check the output
+    assert caplog.messages == expected
 
 
 def test_inputs_bad_account_type():
@@ -430,7 +514,7 @@ async def test_main(mocker, ok_response):
         **{
             'account_type': 'org',
             'org_name': 'test',
-            'image_names': 'a,b,c',
+            'image_names': 'a',
             'timestamp_to_use': 'updated_at',
             'cut_off': '2 hours ago UTC',
             'untagged_only': 'false',
@@ -452,60 +536,21 @@ async def test_public_images_with_more_than_5000_downloads(mocker, capsys):
     For these cases, instead of just outputting the error, we bundle the images names and list
     them once at the end, with the necessary context to act on them if wanted.
     """
-    mock_delete_response = Mock()
-    mock_delete_response.headers = {'x-ratelimit-remaining': '1', 'link': ''}
-    mock_delete_response.is_error = True
-    mock_delete_response.status_code = 400
-    mock_delete_response.json = lambda: {'message': main.GITHUB_ASSISTANCE_MSG}
-
-    mock_list_response = Mock()
-    mock_list_response.headers = {'x-ratelimit-remaining': '1', 'link': ''}
-    mock_list_response.is_error = True
-    mock_list_response.status_code = 400
-
-    class DualMock:
-        counter = 0
-
-        def __call__(self):
-            if self.counter == 0:
-                self.counter += 1
-                return [
-                    {
-                        'id': 1,
-                        'updated_at': '2021-05-26T14:03:03Z',
-                        'name': 'a',
-                        'created_at': '2021-05-26T14:03:03Z',
-                        'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-                    },
-                    {
-                        'id': 1,
-                        'updated_at': '2021-05-26T14:03:03Z',
-                        'name': 'b',
-                        'created_at': '2021-05-26T14:03:03Z',
-                        'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-                    },
-                    {
-                        'id': 1,
-                        'updated_at': '2021-05-26T14:03:03Z',
-                        'name': 'c',
-                        'created_at': '2021-05-26T14:03:03Z',
-                        'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-                    },
-                ]
-            return [
-                {
-                    'id': 1,
-                    'updated_at': '2021-05-26T14:03:03Z',
-                    'name': 'a',
-                    'created_at': '2021-05-26T14:03:03Z',
-                    'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-                },
-            ]
-
-    mock_list_response.json = DualMock()
-
-    mocker.patch.object(AsyncClient, 'get', return_value=mock_list_response)
-    mocker.patch.object(AsyncClient, 'delete', return_value=mock_delete_response)
+    mocker.patch.object(
+        main.GithubAPI,
+        'list_packages',
+        return_value=[
+            PackageResponse(id=1, name=name, created_at=datetime.now(), updated_at=datetime.now())
+            for name in ['a', 'b', 'c']
+        ],
+    )
+    # Record each image the way post_deletion_output does, for versions that need Github's assistance
+    mocker.patch.object(main, 'needs_github_assistance', [])
+    mocker.patch.object(
+        main,
+        'get_and_delete_old_versions',
+        AsyncMock(side_effect=lambda image_name, *args: main.needs_github_assistance.append(f'{image_name}:1')),
+    )
     await main_(
         **{
             'account_type': 'org',
@@ -530,6 +575,10 @@ async def test_public_images_with_more_than_5000_downloads(mocker, capsys):
     ]:
         assert m in captured.out
 
+    # Images are processed concurrently, so the order they're listed in isn't fixed
+    listed_images = [line for line in captured.out.splitlines() if line.startswith('\t- ')]
+    assert sorted(listed_images) == ['\t- a:1', '\t- b:1', '\t- c:1']
+
 
 class RotatingStatusCodeMock(Mock):
     index = 0
@@ -557,19 +606,21 @@ class RotatingStatusCodeMock(Mock):
 
 
 async def test_outputs_are_set(mocker):
-    mock_list_response = Mock()
-    mock_list_response.headers = {'x-ratelimit-remaining': '1', 'link': ''}
-    mock_list_response.is_error = True
-    mock_list_response.status_code = 200
-    mock_list_response.json = lambda: [
-        {
-            'id': 1,
-            'updated_at': '2021-05-26T14:03:03Z',
-            'name': 'a',
-            'created_at': '2021-05-26T14:03:03Z',
-            'metadata': {'container': {'tags': []}, 'package_type': 'container'},
-        }
-    ]
+    mock_list_response = SimpleNamespace(
+        headers={'x-ratelimit-remaining': '1', 'link': ''},
+        is_error=True,
+        status_code=200,
+        json=lambda: [
+            {
+                'id': 1,
+                'updated_at': '2021-05-26T14:03:03Z',
+                'name': 'a',
+                'created_at': '2021-05-26T14:03:03Z',
+                'metadata': {'container': {'tags': []}, 'package_type': 'container'},
+            }
+        ],
+        raise_for_status=lambda: None,
+    )
 
     mocker.patch.object(AsyncClient, 'get', return_value=mock_list_response)
     mocker.patch.object(AsyncClient, 'delete', return_value=RotatingStatusCodeMock())